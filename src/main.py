@@ -4,122 +4,163 @@ import re
 import os
 import sys
 import argparse
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from operator import itemgetter
+from typing import List, Dict, Any, Tuple
+
+# orjson is a faster encoder with identical output at indent 2; fall back to json.
+try:
+    import orjson
+
+    def dump_json(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    def dump_json(obj: Any) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+# Only the first pages are scanned; outlines of long documents are front-loaded.
+MAX_PAGES = 50
 
 class PDFOutlineExtractor:
     def __init__(self):
-        # Patterns to identify and level numbered headings.
-        self.level_patterns = [
-            (re.compile(r'^\d+\.\d+\.\d+\s'), 3),
-            (re.compile(r'^\d+\.\d+\s'), 2),
-            (re.compile(r'^\d+\.\s'), 1),
-        ]
+        # Pattern to identify numbered headings ("1. ", "1.2 ", "1.2.3 "); the
+        # level is the depth of the captured numbering prefix.
+        self.level_pattern = re.compile(r'^(\d+(?:\.\d+){1,2}|\d+\.)\s')
         
-        # Patterns to specifically identify list items.
-        self.list_item_patterns = [
-            re.compile(r'^\s*[\*\-•]\s+'),
-            re.compile(r'^\s*[a-z]\)\s+'),
-            re.compile(r'^\s*\(\d+\)\s+'),
-            re.compile(r'^\s*\d+\)\s+'), # NEW: Catches "1)", "2)"
+        # Patterns to specifically identify list items, fused into a single
+        # alternation so each line costs one match call.
+        list_item_patterns = [
+            r'[\*\-•]\s+',
+            r'[a-z]\)\s+',
+            r'\(\d+\)\s+',
+            r'\d+\)\s+', # NEW: Catches "1)", "2)"
         ]
+        self.list_item_pattern = re.compile(r'^\s*(?:' + '|'.join(list_item_patterns) + ')')
         
-        # Patterns to filter out junk text.
-        self.junk_patterns = [
-            re.compile(r'^\s*page\s*\d+', re.IGNORECASE),
-            re.compile(r'©|copyright|\u00A9', re.IGNORECASE),
-            re.compile(r'.+\s*\.{3,}\s*\d+\s*$'), 
+        # Patterns to filter out junk text, fused the same way. Copyright notices
+        # and dotted TOC leaders are screened with plain substring tests first.
+        self.toc_pattern = re.compile(r'.+\s*\.{3,}\s*\d+\s*$')
+        junk_patterns = [
+            r'^\s*page\s*\d+',
             # NEW: More robust date patterns
-            re.compile(r'\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec|january|february|march|april|june|july|august|september|october|november|december)\s+\d{1,2},?\s+\d{4}', re.IGNORECASE),
+            r'\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec|january|february|march|april|june|july|august|september|october|november|december)\s+\d{1,2},?\s+\d{4}',
         ]
-        self.paragraph_starters = {'this', 'the', 'in', 'at', 'for', 'with', 'from', 'by', 'an', 'a', 'it', 'as', 'on', 'to', 'of', 'and', 'or', 'but', 'however'}
+        self.junk_pattern = re.compile('|'.join(f'(?:{p})' for p in junk_patterns), re.IGNORECASE)
+        # Splits a numbered line into its numbering prefix and content.
+        self.numbered_pattern = re.compile(r'^(\d+(\.\d+)*)\.?\s+(.*)')
+        self.paragraph_starters = frozenset({'this', 'the', 'in', 'at', 'for', 'with', 'from', 'by', 'an', 'a', 'it', 'as', 'on', 'to', 'of', 'and', 'or', 'but', 'however'})
 
     def extract_outline(self, pdf_path: str) -> Dict[str, Any]:
         doc = fitz.open(pdf_path)
         try:
             title = self._extract_title(doc, pdf_path)
-            text_blocks = self._extract_text_blocks(doc)
-            classified_blocks = self._classify_blocks(text_blocks)
+            text_blocks, page_heights = self._extract_text_blocks(doc)
+            classified_blocks = self._classify_blocks(text_blocks, page_heights)
             outline = self._assign_levels_by_structure(classified_blocks)
-            final_outline = self._deduplicate_outline(outline)
-            return {"title": title, "outline": final_outline}
+            return {"title": title, "outline": outline}
         finally:
             doc.close()
 
     def _extract_title(self, doc: fitz.Document, pdf_path: str) -> str:
-        if doc.metadata and doc.metadata.get('title'):
-            title = doc.metadata['title'].strip()
-            if len(title) > 5 and 'untitled' not in title.lower(): return title
+        # doc.metadata builds a new dict on every access, so read it once.
+        metadata = doc.metadata or {}
+        title = (metadata.get('title') or '').strip()
+        if len(title) > 5 and 'untitled' not in title.lower(): return title
         return os.path.basename(pdf_path).replace('.pdf', '').replace('_', ' ').title()
 
-    def _extract_text_blocks(self, doc: fitz.Document) -> List[Dict[str, Any]]:
-        blocks = []
-        for page_num, page in enumerate(doc):
-            if page_num >= 50: break
-            page_height = page.rect.height if page.rect.height > 0 else 1.0
+    def _extract_text_blocks(self, doc: fitz.Document) -> Tuple[List[Dict[str, Any]], List[float]]:
+        # Page heights are kept once per page rather than copied into every line record.
+        blocks, page_heights = [], []
+        append = blocks.append
+        for page_num in range(min(doc.page_count, MAX_PAGES)):
+            page = doc.load_page(page_num)
+            rect_height = page.rect.height
+            page_heights.append(rect_height if rect_height > 0 else 1.0)
+            page_no = page_num + 1
+            # Image blocks are excluded since TEXT_PRESERVE_IMAGES is not set.
             raw_blocks = page.get_text("dict", flags=fitz.TEXT_INHIBIT_SPACES)["blocks"]
             for block in raw_blocks:
-                if "lines" in block:
-                    for line in block["lines"]:
-                        line_text = "".join(span["text"] for span in line["spans"]).strip()
-                        if line_text:
-                            blocks.append({
-                                "text": line_text, "page": page_num + 1,
-                                "y_pos": line["bbox"][1], "x_pos": line["bbox"][0],
-                                "page_height": page_height
-                            })
-        return blocks
-
-    def _is_ignorable_line(self, text: str, y_pos: float, page_height: float, page_num: int) -> bool:
-
-        # A filter to remove junk text before classification.
-        if any(p.search(text) for p in self.junk_patterns): return True
-
-        # Be more aggressive on the first page (page_num == 1)
-        margin = 0.20 if page_num == 1 else 0.11
-        if y_pos < page_height * margin or y_pos > page_height * (1 - margin): return True
-        if text.strip().isdigit(): return True
-        if text.endswith('.') and len(text.split()) > 10: return True
+                if "lines" not in block: continue
+                for line in block["lines"]:
+                    line_text = "".join([span["text"] for span in line["spans"]]).strip()
+                    if not line_text: continue
+                    x_pos, y_pos = line["bbox"][:2]
+                    append({
+                        "text": line_text, "page": page_no,
+                        "y_pos": y_pos, "x_pos": x_pos
+                    })
+        return blocks, page_heights
+
+    def _page_margins(self, page_heights: List[float]) -> List[Tuple[float, float]]:
+        # Precomputes the (top, bottom) header/footer cutoffs once per page.
+        margins = []
+        for page_num, page_height in enumerate(page_heights, start=1):
+            # Be more aggressive on the first page (page_num == 1)
+            margin = 0.20 if page_num == 1 else 0.11
+            margins.append((page_height * margin, page_height * (1 - margin)))
+        return margins
+
+    def _is_ignorable_line(self, text: str, y_pos: float, top: float, bottom: float) -> bool:
+
+        # A filter to remove junk text before classification, cheapest checks first.
+        if y_pos < top or y_pos > bottom: return True
+        # text arrives stripped and non-empty from _classify_blocks.
+        if text.isdigit(): return True
+        if text[-1] == '.' and len(text.split()) > 10: return True
+
+        if '©' in text or 'copyright' in text.lower(): return True
+        if '...' in text and self.toc_pattern.search(text): return True
+        if self.junk_pattern.search(text): return True
         return False
 
-    def _classify_blocks(self, text_blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _classify_blocks(self, text_blocks: List[Dict[str, Any]], page_heights: List[float]) -> List[Dict[str, Any]]:
         # Classifies each block as a HEADING, LIST_ITEM, or junk.
         candidates = []
+        # Bind hot lookups to locals; this loop runs once per extracted line.
+        is_ignorable = self._is_ignorable_line
+        match_list_item = self.list_item_pattern.match
+        match_numbered = self.numbered_pattern.match
+        paragraph_starters = self.paragraph_starters
+        page_margins = self._page_margins(page_heights)
         for block in text_blocks:
             text = block['text'].strip()
-            if self._is_ignorable_line(text, block['y_pos'], block['page_height'], block['page']):
+            top, bottom = page_margins[block['page'] - 1]
+            if is_ignorable(text, block['y_pos'], top, bottom):
                 continue
 
             block_type = None
-            word_count = len(text.split())
+            words = text.split()
+            word_count = len(words)
 
             # Check for list items first.
-            if any(p.match(text) for p in self.list_item_patterns):
+            if match_list_item(text):
                 block_type = "LIST_ITEM"
             
             # Differentiate numbered headings from numbered list items.
-            numbered_match = re.match(r'^(\d+(\.\d+)*)\.?\s+(.*)', text)
-            if not block_type and numbered_match:
+            numbered_match = match_numbered(text) if not block_type else None
+            if numbered_match:
                 content = numbered_match.group(3)
                 # If content starts with a lowercase letter, it's a list item.
-                if content and (content[0].islower() or len(text.split()) > 10):
+                if content and (content[0].islower() or word_count > 10):
                     block_type = "LIST_ITEM"
                 else: # Otherwise, it's a heading.
                     block_type = "HEADING"
             
             # If not a list item or numbered heading, check for un-numbered headings.
             if not block_type:
-                starts_like_paragraph = word_count > 0 and text.split()[0].lower() in self.paragraph_starters
+                starts_like_paragraph = word_count > 0 and words[0].lower() in paragraph_starters
                 if not starts_like_paragraph:
+                    is_title = text.istitle()
                     if (text.isupper() and 1 <= word_count <= 6) or \
-                       (text.istitle() and 1 <= word_count <= 8 and text.endswith(':')) or \
-                       (text.istitle() and 1 <= word_count <= 4): # Stricter rule for titles without colons
+                       (is_title and 1 <= word_count <= 8 and text[-1] == ':') or \
+                       (is_title and 1 <= word_count <= 4): # Stricter rule for titles without colons
                         block_type = "HEADING"
             
             if block_type:
                 block['type'] = block_type
                 candidates.append(block)
                 
-        candidates.sort(key=lambda x: (x["page"], x["y_pos"]))
+        candidates.sort(key=itemgetter("page", "y_pos"))
         return candidates
 
     def _assign_levels_by_structure(self, classified_blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -127,6 +168,8 @@ class PDFOutlineExtractor:
         if not classified_blocks: return []
         
         outline = []
+        # Drops duplicate headings that have the same text, level, AND page number as they are emitted.
+        seen_tuples = set()
         indent_stack = [] 
         last_heading_level = 0
         
@@ -139,13 +182,10 @@ class PDFOutlineExtractor:
                 current_level = min(last_heading_level + 1, 3)
             
             elif block['type'] == 'HEADING':
-                is_numbered = False
-                for pattern, level in self.level_patterns:
-                    if pattern.match(text):
-                        current_level, is_numbered = level, True
-                        break
-                if not is_numbered and re.match(r'^\d+\.\s', text):
-                    current_level, is_numbered = 1, True
+                level_match = self.level_pattern.match(text)
+                is_numbered = level_match is not None
+                if is_numbered:
+                    current_level = level_match.group(1).rstrip('.').count('.') + 1
 
                 if not is_numbered:
                     while indent_stack and x_pos < indent_stack[-1] - 5:
@@ -159,23 +199,24 @@ class PDFOutlineExtractor:
 
             if current_level > 0:
                 final_level = max(1, min(current_level, 3))
-                outline.append({"level": f"H{final_level}", "text": text, "page": block["page"]})
+                level_tag = f"H{final_level}"
+                heading_key = (" ".join(text.lower().split()), block["page"], level_tag)
+                if heading_key not in seen_tuples:
+                    seen_tuples.add(heading_key)
+                    outline.append({"level": level_tag, "text": text, "page": block["page"]})
                 if block['type'] == 'HEADING':
                     last_heading_level = final_level
         return outline
 
-    def _deduplicate_outline(self, outline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        # Removes duplicate headings that have the same text, level, AND page number.
-        deduped_outline = []
-        seen_tuples = set()
-        for heading in outline:
-            normalized_text = re.sub(r'\s+', ' ', heading['text']).strip().lower()
-            heading_key = (normalized_text, heading['page'], heading['level'])
-            if heading_key not in seen_tuples:
-                deduped_outline.append(heading)
-                seen_tuples.add(heading_key)
-        return deduped_outline
 
+# One extractor per process; it keeps no per-document state, so compiled patterns are shared across files.
+_EXTRACTOR = None
+
+def get_extractor() -> PDFOutlineExtractor:
+    global _EXTRACTOR
+    if _EXTRACTOR is None:
+        _EXTRACTOR = PDFOutlineExtractor()
+    return _EXTRACTOR
 
 def main():
     parser = argparse.ArgumentParser(description='A general, high-precision PDF outline extractor for H1-H3 headings.')
@@ -191,29 +232,35 @@ def main():
         process_single_pdf(input_path, output_dir)
     elif os.path.isdir(input_path):
         print(f"📚 Processing all PDF files in directory: {input_path}")
-        for filename in os.listdir(input_path):
-            if filename.lower().endswith('.pdf'):
-                file_path = os.path.join(input_path, filename)
-                process_single_pdf(file_path, output_dir if output_dir else input_path)
+        pdf_files = [f for f in os.listdir(input_path) if f.lower().endswith('.pdf')]
+        target_dir = output_dir if output_dir else input_path
+        # PDFs are independent and CPU-bound, so spread them across processes.
+        success_count = 0
+        with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=get_extractor) as executor:
+            futures = [executor.submit(process_single_pdf, os.path.join(input_path, f), target_dir) for f in pdf_files]
+            for future in as_completed(futures):
+                if future.result(): success_count += 1
+        print(f"📊 Processed {success_count}/{len(pdf_files)} PDF files successfully.")
     else:
         print(f"❌ Input path is not a valid file or directory: {input_path}")
         sys.exit(1)
 
-def process_single_pdf(pdf_path: str, output_dir: str = None):
+def process_single_pdf(pdf_path: str, output_dir: str = None) -> bool:
     if output_dir is None: output_dir = os.path.dirname(pdf_path) or "."
     os.makedirs(output_dir, exist_ok=True)
     output_path = os.path.join(output_dir, os.path.basename(pdf_path).replace('.pdf', '.json'))
     
     print(f"📄 Processing: {pdf_path}")
     try:
-        extractor = PDFOutlineExtractor()
-        result = extractor.extract_outline(pdf_path)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
+        result = get_extractor().extract_outline(pdf_path)
+        with open(output_path, 'wb') as f:
+            f.write(dump_json(result))
         print(f"✅ Success! Found {len(result['outline'])} headings for '{result['title']}'.")
         print(f"   -> Saved to: {output_path}\n")
+        return True
     except Exception as e:
         print(f"❌ Error processing {pdf_path}: {e}\n")
+        return False
 
 if __name__ == "__main__":
     main()
\ No newline at end of file